@@ -0,0 +1,74 @@
+"""
+Builds and caches TensorRT engines for the curb-ramp detector.
+
+torch_tensorrt is optional: load_trt_model returns None when it isn't installed or the
+build fails, and the detector keeps running the PyTorch model. An engine bakes in the
+model's weights and is specific to the GPU model, batch shape, precision and TensorRT
+version, so all five are in the cache key.
+"""
+import copy
+import hashlib
+from pathlib import Path
+
+import torch
+
+ENGINE_DIR = Path(__file__).resolve().parent.parent / "trt_engines"
+INPUT_SHAPE = (3, 2048, 4096)
+
+
+def model_fingerprint(model):
+    """
+    Short identifier of the model's weights: the Hugging Face commit it was loaded from, or
+    a hash of its state_dict when that isn't known (e.g. a local checkout).
+    """
+    commit = getattr(getattr(model, "config", None), "_commit_hash", None)
+    if commit:
+        return commit[:12]
+    digest = hashlib.sha256()
+    for name, tensor in model.state_dict().items():
+        digest.update(name.encode())
+        digest.update(tensor.detach().cpu().contiguous().reshape(-1).view(torch.uint8).numpy().tobytes())
+    return digest.hexdigest()[:12]
+
+
+def engine_path(batch_size, trt_version, model_id, precision="fp16"):
+    gpu_name = torch.cuda.get_device_name().replace(" ", "_")
+    return ENGINE_DIR / f"rampnet-{model_id}_{gpu_name}_b{batch_size}_{precision}_trt{trt_version}.ts"
+
+
+def load_trt_model(model, batch_size):
+    """
+    Returns a TensorRT (TorchScript) module running `model` in fp16 for fixed
+    (batch_size, 3, 2048, 4096) half-precision inputs, building and saving the engine on
+    first use. Returns None if torch_tensorrt is unavailable or the build fails.
+    """
+    try:
+        import torch_tensorrt
+    except ImportError:
+        print("⚠ torch_tensorrt is not installed; using the PyTorch model.")
+        return None
+
+    path = engine_path(batch_size, torch_tensorrt.__version__, model_fingerprint(model))
+    if path.exists():
+        print(f"-> Loading TensorRT engine {path.name}")
+        return torch.jit.load(str(path), map_location="cuda").eval()
+
+    print(f"-> Building TensorRT engine for batches of {batch_size} (one-time; takes several minutes)...")
+    try:
+        # Trace a half-precision copy; the caller keeps the fp32 model as its fallback.
+        example = torch.zeros((batch_size, *INPUT_SHAPE), dtype=torch.half, device="cuda")
+        with torch.no_grad():
+            traced = torch.jit.trace(copy.deepcopy(model).half(), example)
+        trt_model = torch_tensorrt.compile(
+            traced,
+            ir="ts",
+            inputs=[torch_tensorrt.Input((batch_size, *INPUT_SHAPE), dtype=torch.half)],
+            enabled_precisions={torch.half},
+        )
+    except Exception as e:
+        print(f"⚠ TensorRT build failed ({e}); using the PyTorch model.")
+        return None
+
+    ENGINE_DIR.mkdir(exist_ok=True)
+    torch.jit.save(trt_model, str(path))
+    return trt_model
@@ -1,15 +1,19 @@
 import threading
 
 import torch
+import torch.nn.functional as F
 from transformers import AutoModel
 import numpy as np
-from torchvision import transforms
-from skimage.feature import peak_local_max
+from torchvision.transforms import v2
+
+# Peak extraction settings — the skimage peak_local_max parameters RampNet was evaluated with.
+PEAK_THRESHOLD = 0.55
+PEAK_MIN_DISTANCE = 10
 
 
 class CurbRampDetector:
-    def __init__(self):
-        # detect() is called from many download threads; concurrent full-resolution
+    def __init__(self, half_precision=True, compile=False, tensorrt=False, batch_size=1):
+        # One detector may be shared across threads; concurrent full-resolution
         # forward passes would exhaust GPU memory, so device work is serialized.
         self._inference_lock = threading.Lock()
         if torch.cuda.is_available():
@@ -21,20 +25,196 @@ class CurbRampDetector:
 
         self.model = AutoModel.from_pretrained("projectsidewalk/rampnet-model", trust_remote_code=True).to(self.DEVICE).eval()
 
-    def detect(self, pil_image):
-        preprocess = transforms.Compose([
-            transforms.Resize((2048, 4096), interpolation=transforms.InterpolationMode.BILINEAR),
-            transforms.ToTensor(),
-            transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
+        # On CUDA, run the forward pass under fp16 autocast with NHWC (channels_last)
+        # tensors so cuDNN can use Tensor Core kernels. Weights stay fp32; autocast picks
+        # fp32 for the numerically sensitive ops. half_precision=False reproduces the
+        # fp32 configuration RampNet was evaluated with.
+        self.half_precision = half_precision and self.DEVICE.type == "cuda"
+        if self.half_precision:
+            self.model = self.model.to(memory_format=torch.channels_last)
+
+        # Resizing and normalization run on the device, so only uint8 bytes (a quarter of
+        # float32) cross to the GPU.
+        self._preprocess = v2.Compose([
+            v2.Resize((2048, 4096), interpolation=v2.InterpolationMode.BILINEAR, antialias=True),
+            v2.ToDtype(torch.float32, scale=True),
+            v2.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
         ])
 
-        img_tensor = preprocess(pil_image).unsqueeze(0)
+        self.batch_size = batch_size
+
+        # On CUDA, batches are staged in a preallocated pinned (page-locked) buffer, so the
+        # DMA engine copies straight from it instead of the driver bouncing the bytes
+        # through a pageable buffer first.
+        self._staging = None
+        if self.DEVICE.type == "cuda":
+            self._staging = torch.empty((batch_size, 2048, 4096, 3), dtype=torch.uint8, pin_memory=True)
+            self._staging_free = torch.cuda.Event()
+
+        # Every batch has the same shape, so on CUDA the model can be compiled ahead of
+        # time for exactly that shape: a cached TensorRT fp16 engine, or torch.compile
+        # (Inductor fusion + CUDA graphs). Either way the batch shape is fixed, so short
+        # batches are padded up to batch_size in detect_batch.
+        self.tensorrt = False
+        self.compiled = False
+        if tensorrt and self.DEVICE.type == "cuda":
+            from detectors._trt_cache import load_trt_model
+            trt_model = load_trt_model(self.model, batch_size)
+            if trt_model is not None:
+                self.model = trt_model
+                self.tensorrt = True
+        if compile and not self.tensorrt and self.DEVICE.type == "cuda":
+            self.compiled = True
+            self._compile()
+
+    def _compile(self):
+        warmup = [np.zeros((2048, 4096, 3), dtype=np.uint8)] * self.batch_size
+        self.detect_batch(warmup)  # eager warmup: cuDNN autotuning, allocator growth
+        eager_model = self.model
+        torch._dynamo.config.cache_size_limit = 8
+        self.model = torch.compile(eager_model, mode="reduce-overhead", fullgraph=True, dynamic=False)
+        try:
+            print(f"-> Compiling the detector for batches of {self.batch_size} (takes a few minutes)...")
+            self.detect_batch(warmup)  # compiles and captures the CUDA graph
+        except Exception as e:
+            print(f"⚠ torch.compile failed ({e}); falling back to eager inference.")
+            self.model = eager_model
+            self.compiled = False
+
+    def inference_settings(self):
+        """How this detector runs the model; recorded with each run, since fp16 shifts confidences."""
+        if self.tensorrt:
+            backend = "tensorrt"
+        elif self.compiled:
+            backend = "torch.compile"
+        else:
+            backend = "eager"
+        return {
+            "device": self.DEVICE.type,
+            "backend": backend,
+            "precision": "fp16" if self.tensorrt or self.half_precision else "fp32",
+            "batch_size": self.batch_size,
+        }
+
+    def detect(self, image):
+        """Detects curb ramps in a single panorama; see detect_batch."""
+        return self.detect_batch([image])[0]
+
+    def detect_batch(self, images):
+        """
+        Runs the panoramas (same-sized RGB PIL images or HxWx3 uint8 arrays) through the
+        model as one batch (amortizes per-forward-pass overhead on the GPU).
+
+        Returns one detection list per image, in input order:
+        [[(x, y, confidence), ...], ...] with x/y normalized to [0, 1].
+        Runs more than batch_size images as several batches. If a batch doesn't fit in GPU
+        memory, batch_size is halved for this and every later call and the batch retried
+        (not for a compiled model, whose batch shape is fixed).
+        """
+        n = len(images)
+        size = self.batch_size  # may shrink while the chunks below run
+        if n > size:
+            return [detections
+                    for start in range(0, n, size)
+                    for detections in self.detect_batch(images[start:start + size])]
+        if (self.compiled or self.tensorrt) and n < self.batch_size:
+            # Pad with repeats of the first image; their results are dropped below.
+            images = list(images) + [images[0]] * (self.batch_size - n)
+
+        out_of_memory = False
+        try:
+            with self._inference_lock, torch.inference_mode():
+                # The HWC -> CHW transpose is a strided copy, so leave it to the device.
+                img_tensor = self._upload(images).permute(0, 3, 1, 2)
+                img_tensor = self._preprocess(img_tensor)
+                if self.tensorrt:
+                    heatmaps = self.model(img_tensor.half())
+                elif self.half_precision:
+                    with torch.autocast("cuda", dtype=torch.float16):
+                        heatmaps = self.model(img_tensor.contiguous(memory_format=torch.channels_last))
+                else:
+                    heatmaps = self.model(img_tensor)
+                # (N, 1, H, W), whether or not the model keeps the channel dimension.
+                all_detections = find_peaks(heatmaps.reshape(len(images), 1, *heatmaps.shape[-2:]))
+        except torch.cuda.OutOfMemoryError:
+            if len(images) == 1 or self.compiled or self.tensorrt:
+                raise
+            out_of_memory = True
+
+        if out_of_memory:
+            # Retry outside the except block: while it's handled, the exception's traceback
+            # keeps the failed pass's tensors alive and empty_cache() can't release them.
+            img_tensor = heatmaps = None
+            torch.cuda.empty_cache()
+            # Remember the smaller size, so later batches don't each OOM before splitting.
+            self.batch_size = len(images) // 2
+            print(f"⚠ GPU out of memory; lowering the detection batch size to {self.batch_size}.")
+            return self.detect_batch(images)
+
+        return all_detections[:n]
+
+    def _upload(self, images):
+        """Copies the images to the device as one (N, H, W, 3) uint8 tensor."""
+        # Batch in the images' native HWC layout: a straight copy per image.
+        arrays = [np.asarray(img, dtype=np.uint8) for img in images]
+        if (self._staging is None or len(arrays) > len(self._staging)
+                or any(a.shape != self._staging.shape[1:] for a in arrays)):
+            return torch.from_numpy(np.stack(arrays)).to(self.DEVICE)
+
+        # A previous copy (e.g. of a batch that then hit OOM) may still be reading the buffer.
+        self._staging_free.synchronize()
+        staging = self._staging.numpy()
+        for i, array in enumerate(arrays):
+            np.copyto(staging[i], array)
+        batch = self._staging[:len(arrays)].to(self.DEVICE, non_blocking=True)
+        self._staging_free.record()
+        return batch
+
+
+def find_peaks(heatmaps):
+    """
+    Finds curb-ramp peaks in an (N, 1, H, W) batch of heatmaps, on whatever device they
+    live on; only the peak coordinates and scores are copied back.
+
+    Equivalent to skimage's peak_local_max(np.clip(heatmap, 0, 1), min_distance=10,
+    threshold_abs=0.55): a pixel is a peak if it is the maximum of its 21x21 window,
+    above the threshold, and not within min_distance of the border. Returns one list of
+    normalized (x, y, confidence) tuples per heatmap, strongest first.
+    """
+    raw = heatmaps.float()
+    hm = raw.clamp(0, 1)
+    d = PEAK_MIN_DISTANCE
+    is_peak = (hm == F.max_pool2d(hm, kernel_size=2 * d + 1, stride=1, padding=d)) & (hm > PEAK_THRESHOLD)
+    is_peak[..., :d, :] = False
+    is_peak[..., -d:, :] = False
+    is_peak[..., :, :d] = False
+    is_peak[..., :, -d:] = False
+
+    # One (K, 5) tensor of (image, row, col, rank, confidence) per peak, in row-major
+    # order like np.nonzero, so it comes back in a single small copy. nonzero() is the
+    # only other sync: the values are gathered with its indices, not with boolean masks
+    # (which would each sync to size their output). Peaks are ranked by the clipped value;
+    # confidence is the unclipped one, as before. Coordinates are exact in float32 (< 2**24).
+    idx = is_peak.nonzero()
+    at_peaks = tuple(idx.T)
+    peaks = torch.cat([idx[:, [0, 2, 3]].float(), hm[at_peaks][:, None], raw[at_peaks][:, None]], dim=1)
+    peaks = peaks.cpu().numpy()
 
-        with self._inference_lock, torch.no_grad():
-            heatmap = self.model(img_tensor.to(self.DEVICE)).squeeze().cpu().numpy()
+    height, width = hm.shape[-2:]
+    all_detections = []
+    for i in range(hm.shape[0]):
+        image_peaks = peaks[peaks[:, 0] == i]
+        rows, cols = image_peaks[:, 1].astype(int), image_peaks[:, 2].astype(int)
+        image_ranks, image_scores = image_peaks[:, 3], image_peaks[:, 4]
 
-        peaks = peak_local_max(np.clip(heatmap, 0, 1), min_distance=10, threshold_abs=0.55)
+        # Pixels on a plateau (e.g. clipped to 1.0) are all window maxima; like
+        # peak_local_max, keep only the first of any peaks closer than min_distance.
+        kept = []
+        for j in np.argsort(-image_ranks, kind="stable"):
+            if all(max(abs(rows[j] - rows[k]), abs(cols[j] - cols[k])) >= d for k in kept):
+                kept.append(j)
 
-        detections = [(float(c / heatmap.shape[1]), float(r / heatmap.shape[0]), float(heatmap[r][c])) for r, c in peaks]
+        all_detections.append(
+            [(float(cols[j] / width), float(rows[j] / height), float(image_scores[j])) for j in kept])
 
-        return detections
\ No newline at end of file
+    return all_detections
@@ -8,6 +8,8 @@ import sys
 import time
 import traceback
 import os
+import queue
+import threading
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timezone
 from importlib.metadata import version as pkg_version
@@ -30,9 +32,15 @@ if hasattr(sys.stderr, 'reconfigure'):
     sys.stderr.reconfigure(errors='replace')
 
 import geojson
+import numpy as np
+import orjson
+import requests
+import shapely
+from requests.adapters import HTTPAdapter
 from streetlevel import streetview
-from shapely.geometry import shape, Point
+from shapely.geometry import shape
 from tqdm import tqdm
+from urllib3.util.retry import Retry
 
 from panorama import fetch_panorama
 # CurbRampDetector is imported lazily in main(): pulling in torch/transformers takes
@@ -41,14 +49,29 @@ from panorama import fetch_panorama
 # --- Configuration ---
 COVERAGE_API_CONCURRENCY = 100
 PROCESSING_CONCURRENCY = 50
+# Panoramas per GPU forward pass. Each full-resolution pano adds several GB of
+# activations, so this is bounded by VRAM (batches that don't fit are split and retried).
+DETECTION_BATCH_SIZE = 4
 COVERAGE_TILE_ZOOM = 17
 METADATA_ATTEMPTS = 3
+# Results written between flushes of the JSONL and cache files.
+FLUSH_EVERY = 32
 
 # Provenance recorded in every JSONL line and in each run's manifest.json.
 MODEL_ID = "rampnet-model"
 MODEL_TRAINING_DATE = "08-21-2025"
 API_VERSION = "1.0.0"
 
+# One pooled keep-alive session for every metadata and coverage-tile request; without it
+# streetlevel opens a new TCP+TLS connection per call. Sized for both thread pools. Status
+# retries are brief (the callers' own backoff loops handle sustained throttling) and hand
+# back the last response rather than raising, as an unpooled request would.
+HTTP_SESSION = requests.Session()
+HTTP_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=256, pool_maxsize=256,
+    max_retries=Retry(total=2, backoff_factor=0.2, status_forcelist=[429, 500, 502, 503, 504],
+                      raise_on_status=False)))
+
 
 def fetch_metadata_with_retry(pano_id):
     """
@@ -57,7 +80,7 @@ def fetch_metadata_with_retry(pano_id):
     Returns None if all attempts fail.
     """
     for attempt in range(METADATA_ATTEMPTS):
-        metadata = streetview.find_panorama_by_id(pano_id)
+        metadata = streetview.find_panorama_by_id(pano_id, session=HTTP_SESSION)
         if metadata is not None:
             return metadata
         if attempt < METADATA_ATTEMPTS - 1:
@@ -73,6 +96,15 @@ def latlon_to_tile(lat_deg, lon_deg, zoom):
     ytile = int((1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n)
     return xtile, ytile
 
+def tile_to_bbox(x, y, zoom):
+    """Returns a Slippy Map tile's (min_lon, min_lat, max_lon, max_lat); inverse of latlon_to_tile."""
+    n = 2.0 ** zoom
+    def tile_lon(tx):
+        return tx / n * 360.0 - 180.0
+    def tile_lat(ty):
+        return math.degrees(math.atan(math.sinh(math.pi * (1.0 - 2.0 * ty / n))))
+    return tile_lon(x), tile_lat(y + 1), tile_lon(x + 1), tile_lat(y)
+
 def get_geojson_hash(geojson_data):
     """Creates a stable SHA256 hash of the GeoJSON geometry."""
     # The root of the geojson is the geometry object itself.
@@ -85,8 +117,9 @@ def load_processed_ids(cache_file_path):
     """Loads a set of already processed panorama IDs from the cache file."""
     if not os.path.exists(cache_file_path):
         return set()
+    # One bulk read + C-level split; the cache reaches millions of lines on a city run.
     with open(cache_file_path, 'r') as f:
-        return {line.strip() for line in f}
+        return set(f.read().split())
 
 def fetch_panos_for_tile(tile_x, tile_y, area_shape):
     """
@@ -97,17 +130,24 @@ def fetch_panos_for_tile(tile_x, tile_y, area_shape):
     """
     for attempt in range(3):
         try:
-            panos_in_tile = streetview.get_coverage_tile(tile_x, tile_y)
-            return {p.id: (p.lat, p.lon) for p in panos_in_tile if Point(p.lon, p.lat).within(area_shape)}
+            panos_in_tile = streetview.get_coverage_tile(tile_x, tile_y, session=HTTP_SESSION)
+            # One vectorized GEOS call per tile rather than a Point + within() per pano.
+            lons = np.fromiter((p.lon for p in panos_in_tile), dtype=float, count=len(panos_in_tile))
+            lats = np.fromiter((p.lat for p in panos_in_tile), dtype=float, count=len(panos_in_tile))
+            inside = shapely.contains_xy(area_shape, lons, lats)
+            return {p.id: (p.lat, p.lon) for p, keep in zip(panos_in_tile, inside) if keep}
         except Exception:
             if attempt < 2:
                 time.sleep(2 * (attempt + 1) + random.uniform(0, 1))
     return None
 
-def process_pano(pano_id, lat, lon):
+def download_pano(pano_id, lat, lon):
     """
-    Downloads image and metadata, runs detection on, and returns results for a single panorama.
-    Designed to be run concurrently in a gevent pool.
+    Downloads metadata and the equirectangular image for a single panorama.
+    Designed to be run concurrently in the processing thread pool; detection runs
+    afterwards on batches of downloaded panos (see detect_downloaded).
+
+    Returns a 'downloaded' result carrying the image, or a 'skipped'/'failure' result.
     """
     try:
         # Get metadata. A None result can be transient (Google's metadata endpoint
@@ -124,20 +164,85 @@ def process_pano(pano_id, lat, lon):
         if equi is None:
             return {'status': 'failure', 'pano_id': pano_id, 'reason': 'Failed to download equirectangular image'}
 
-        # The detector returns the list of center points and confidence: [[x, y, confidence], ...] or an empty list [].
-        detections = curb_ramp_detector.detect(equi)
-
         return {
-            'status': 'success',
+            'status': 'downloaded',
             'pano_id': pano_id,
             'lat': float(lat),
             'lon': float(lon),
             'metadata': metadata,
-            'detections': detections
+            'image': equi
         }
     except Exception as e:
         return {'status': 'failure', 'pano_id': pano_id, 'reason': str(e)}
 
+def detect_downloaded(downloaded):
+    """
+    Runs the detector over a batch of 'downloaded' results in one forward pass and
+    returns the matching 'success' results (or 'failure' results if the batch failed).
+    """
+    try:
+        # The detector returns, per image, the list of center points and confidence:
+        # [[x, y, confidence], ...] or an empty list [].
+        all_detections = curb_ramp_detector.detect_batch([r['image'] for r in downloaded])
+    except Exception as e:
+        return [{'status': 'failure', 'pano_id': r['pano_id'], 'reason': str(e)} for r in downloaded]
+
+    return [
+        {
+            'status': 'success',
+            'pano_id': r['pano_id'],
+            'lat': r['lat'],
+            'lon': r['lon'],
+            'metadata': r['metadata'],
+            'detections': detections
+        } for r, detections in zip(downloaded, all_detections)
+    ]
+
+def download_to_queue(task, detect_queue, results, stop):
+    """
+    Download stage of the processing pipeline (runs in the download thread pool).
+    Downloaded panos go to detect_queue — a bounded queue, so a full one blocks here and
+    caps how many images sit in RAM ahead of the GPU; every other outcome goes straight
+    to results.
+    """
+    result = download_pano(*task)
+    if result['status'] != 'downloaded':
+        results.put(result)
+        return
+    while not stop.is_set():
+        try:
+            detect_queue.put(result, timeout=1)
+            return
+        except queue.Full:
+            continue
+
+def detection_worker(detect_queue, results, stop, batch_size):
+    """
+    Detection stage of the processing pipeline (one dedicated thread): takes whatever is
+    queued, up to batch_size panos, runs it through the GPU as one batch, and hands the
+    outcomes to results — so downloads keep running while the GPU is busy. batch_size is
+    capped by the detector's, which drops if a batch runs out of GPU memory.
+
+    Every pano taken off the queue produces exactly one result, even if something
+    unexpected fails: the main thread counts results to know when the run is done.
+    """
+    while not stop.is_set():
+        try:
+            batch = [detect_queue.get(timeout=1)]
+        except queue.Empty:
+            continue
+        try:
+            while len(batch) < min(batch_size, curb_ramp_detector.batch_size):
+                try:
+                    batch.append(detect_queue.get_nowait())
+                except queue.Empty:
+                    break
+            batch_results = detect_downloaded(batch)
+        except Exception as e:
+            batch_results = [{'status': 'failure', 'pano_id': r['pano_id'], 'reason': str(e)} for r in batch]
+        for result in batch_results:
+            results.put(result)
+
 class IncompleteMetadataError(Exception):
     """Raised when a pano's metadata lacks fields required by the output record."""
 
@@ -239,7 +344,10 @@ def load_or_init_run_dir(run_dir, geojson_path, geojson_data, area_hash):
     return manifest
 
 def record_run(manifest_path, manifest, started_at, found, success, skipped, failed):
-    """Appends one entry to the manifest's run history."""
+    """
+    Appends one entry to the manifest's run history, including how the detector ran
+    (precision and backend change the confidences, and a resumed run may differ).
+    """
     manifest['runs'].append({
         'started_at': started_at,
         'finished_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
@@ -247,6 +355,7 @@ def record_run(manifest_path, manifest, started_at, found, success, skipped, fai
         'processed': success,
         'skipped': skipped,
         'failed': failed,
+        'inference': curb_ramp_detector.inference_settings(),
     })
     save_manifest(manifest_path, manifest)
 
@@ -283,15 +392,27 @@ def run_labeler(geojson_path, run_name, scan_only=False):
     # 2. Find all panorama IDs in the area
     # The geojson_data is the geometry object itself, which shapely can read directly.
     area_shape = shape(geojson_data)
+    # Prepare once: every tile's containment test reuses GEOS's spatial index of the
+    # polygon edges instead of walking all of them per query. GEOS builds the index
+    # lazily on the first query, so run one here before the worker threads share it. The
+    # point must be inside the envelope, or GEOS answers from the bounding box alone.
+    shapely.prepare(area_shape)
+    shapely.contains_xy(area_shape, *area_shape.representative_point().coords[0])
     bounds = area_shape.bounds
     min_lon, min_lat, max_lon, max_lat = bounds
 
     top_left_x, top_left_y = latlon_to_tile(max_lat, min_lon, COVERAGE_TILE_ZOOM)
     bottom_right_x, bottom_right_y = latlon_to_tile(min_lat, max_lon, COVERAGE_TILE_ZOOM)
 
-    tiles_to_scan = [(x, y) for x in range(top_left_x, bottom_right_x + 1) for y in range(top_left_y, bottom_right_y + 1)]
+    bbox_tiles = [(x, y) for x in range(top_left_x, bottom_right_x + 1) for y in range(top_left_y, bottom_right_y + 1)]
 
-    print(f"-> Scanning {len(tiles_to_scan)} coverage tiles using {COVERAGE_API_CONCURRENCY} concurrent workers...")
+    # Irregular areas leave many bounding-box tiles entirely outside the polygon; skip them
+    # (one vectorized intersects call against the prepared polygon).
+    tile_boxes = shapely.box(*np.array([tile_to_bbox(x, y, COVERAGE_TILE_ZOOM) for x, y in bbox_tiles]).T)
+    tiles_to_scan = [tile for tile, hit in zip(bbox_tiles, shapely.intersects(area_shape, tile_boxes)) if hit]
+
+    print(f"-> Scanning {len(tiles_to_scan)} coverage tiles ({len(bbox_tiles) - len(tiles_to_scan)} outside the area skipped) "
+          f"using {COVERAGE_API_CONCURRENCY} concurrent workers...")
 
     all_panos_in_area = {}
 
@@ -342,46 +463,96 @@ def run_labeler(geojson_path, run_name, scan_only=False):
         for pid in panos_to_process_ids
     ]
 
+    # Results are written in groups of FLUSH_EVERY rather than flushed per pano. JSONL
+    # lines always reach disk before their cache entries, so a hard kill can lose at most
+    # the last group — those panos aren't cached yet and are simply redone next run.
+    pending_lines, pending_ids = [], []
+
+    def flush_pending():
+        if pending_lines:
+            f_jsonl.write(b''.join(pending_lines))
+            f_jsonl.flush()
+            pending_lines.clear()
+        if pending_ids:
+            f_cache.write(''.join(pending_ids))
+            f_cache.flush()
+            pending_ids.clear()
+
+    def handle_result(result):
+        nonlocal success_count, skip_count, fail_count
+        if result['status'] == 'success':
+            # ALWAYS write a line to the JSONL file for a successful process.
+            # The 'detections' key will be an empty list [] if none were found.
+            # Guarded so a single malformed pano cannot abort the whole run.
+            try:
+                output_line = build_output_line(result)
+            except IncompleteMetadataError:
+                # Deterministic skip: cache it so it isn't retried on every run.
+                pending_ids.append(f"{result['pano_id']}\n")
+                skip_count += 1
+            except Exception as e:
+                print(f"  ❌ Failed to build output for {result['pano_id']}. Reason: {e}. Will retry on next run.")
+                fail_count += 1
+            else:
+                pending_lines.append(orjson.dumps(output_line) + b'\n')
+
+                # Mark successfully processed pano in the cache.
+                pending_ids.append(f"{result['pano_id']}\n")
+                success_count += 1
+        elif result['status'] == 'skipped':
+            # Deterministic skips (indoor pano): cache so they aren't refetched.
+            pending_ids.append(f"{result['pano_id']}\n")
+            skip_count += 1
+        else:
+            print(f"  ❌ Failed to process {result['pano_id']}. Reason: {result.get('reason', 'Unknown')}. Will retry on next run.")
+            fail_count += 1
+        if len(pending_ids) >= FLUSH_EVERY:
+            flush_pending()
+        pbar.update(1)
+
+    # Three-stage pipeline: download threads feed a bounded queue, one detection thread
+    # drains it in batches of up to DETECTION_BATCH_SIZE while downloads continue, and this
+    # thread writes the results.
+    detect_queue = queue.Queue(maxsize=2 * DETECTION_BATCH_SIZE)
+    results = queue.Queue()
+    stop = threading.Event()
+    detector_thread = threading.Thread(
+        target=detection_worker, args=(detect_queue, results, stop, DETECTION_BATCH_SIZE), daemon=True)
+
     with open(cache_file, 'a') as f_cache, \
-         open(output_jsonl_file, 'a') as f_jsonl, \
-         ThreadPoolExecutor(max_workers=PROCESSING_CONCURRENCY) as process_pool:
+         open(output_jsonl_file, 'ab') as f_jsonl, \
+         ThreadPoolExecutor(max_workers=PROCESSING_CONCURRENCY) as process_pool, \
+         tqdm(total=len(processing_tasks), desc="Processing New Panoramas") as pbar:
 
-        futures = [process_pool.submit(process_pano, *task) for task in processing_tasks]
+        def report_crash(future, pano_id):
+            # download_to_queue reports its own outcomes; this only catches it dying.
+            if not future.cancelled() and future.exception() is not None:
+                results.put({'status': 'failure', 'pano_id': pano_id, 'reason': repr(future.exception())})
 
-        with tqdm(total=len(futures), desc="Processing New Panoramas") as pbar:
-            for future in as_completed(futures):
-                result = future.result()
-                if result['status'] == 'success':
-                    # ALWAYS write a line to the JSONL file for a successful process.
-                    # The 'detections' key will be an empty list [] if none were found.
-                    # Guarded so a single malformed pano cannot abort the whole run.
-                    try:
-                        output_line = build_output_line(result)
-                    except IncompleteMetadataError:
-                        # Deterministic skip: cache it so it isn't retried on every run.
-                        f_cache.write(f"{result['pano_id']}\n")
-                        f_cache.flush()
-                        skip_count += 1
-                    except Exception as e:
-                        print(f"  ❌ Failed to build output for {result['pano_id']}. Reason: {e}. Will retry on next run.")
-                        fail_count += 1
-                    else:
-                        f_jsonl.write(json.dumps(output_line) + '\n')
-                        f_jsonl.flush()
-
-                        # Mark successfully processed pano in the cache.
-                        f_cache.write(f"{result['pano_id']}\n")
-                        f_cache.flush()
-                        success_count += 1
-                elif result['status'] == 'skipped':
-                    # Deterministic skips (indoor pano): cache so they aren't refetched.
-                    f_cache.write(f"{result['pano_id']}\n")
-                    f_cache.flush()
-                    skip_count += 1
-                else:
-                    print(f"  ❌ Failed to process {result['pano_id']}. Reason: {result.get('reason', 'Unknown')}. Will retry on next run.")
-                    fail_count += 1
-                pbar.update(1)
+        detector_thread.start()
+        try:
+            for task in processing_tasks:
+                future = process_pool.submit(download_to_queue, task, detect_queue, results, stop)
+                future.add_done_callback(lambda f, pano_id=task[0]: report_crash(f, pano_id))
+            received = 0
+            while received < len(processing_tasks):
+                try:
+                    result = results.get(timeout=10)
+                except queue.Empty:
+                    # Downloaded panos would otherwise wait forever for a dead detector.
+                    if not detector_thread.is_alive():
+                        raise RuntimeError("the detection thread stopped unexpectedly; "
+                                           "rerun to resume (finished panos are saved)")
+                    continue
+                handle_result(result)
+                received += 1
+        finally:
+            # Also reached on Ctrl-C: release blocked download threads, drop queued tasks
+            # and save what's done. Stop the threads first, so a failed save can't leave
+            # the pool waiting on them.
+            stop.set()
+            process_pool.shutdown(wait=False, cancel_futures=True)
+            flush_pending()
 
     record_run(manifest_path, manifest, started_at, len(all_panos_in_area), success_count, skip_count, fail_count)
 
@@ -394,8 +565,19 @@ def run_labeler(geojson_path, run_name, scan_only=False):
     print("----------------------")
 
 
+def _positive_int(value):
+    """argparse type for counts that must be at least 1."""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid int value: {value!r}")
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
+
 def main():
-    global PROCESSING_CONCURRENCY, COVERAGE_API_CONCURRENCY
+    global PROCESSING_CONCURRENCY, COVERAGE_API_CONCURRENCY, DETECTION_BATCH_SIZE
 
     parser = argparse.ArgumentParser(
         description="Finds and processes all GSV panoramas within a GeoJSON area, saving results to a .jsonl file."
@@ -410,12 +592,33 @@ def main():
              "(default: the geojson filename without extension)."
     )
     parser.add_argument(
-        "--processing-concurrency", type=int, default=PROCESSING_CONCURRENCY,
-        help="Concurrent workers downloading and detecting panos (default: %(default)s). "
+        "--processing-concurrency", type=_positive_int, default=PROCESSING_CONCURRENCY,
+        help="Concurrent threads downloading panos for the detector (default: %(default)s). "
              "Lower this if Google starts dropping connections."
     )
     parser.add_argument(
-        "--coverage-concurrency", type=int, default=COVERAGE_API_CONCURRENCY,
+        "--batch-size", type=_positive_int, default=DETECTION_BATCH_SIZE,
+        help="Panoramas per GPU forward pass (default: %(default)s). "
+             "Lower this if the GPU runs out of memory."
+    )
+    parser.add_argument(
+        "--full-precision", action="store_true",
+        help="Run inference in fp32 instead of fp16 autocast on CUDA (slower; matches the "
+             "configuration RampNet was evaluated with)."
+    )
+    parser.add_argument(
+        "--compile", action="store_true",
+        help="Compile the model with torch.compile for the fixed batch shape (CUDA only). "
+             "Adds a few minutes of startup; worth it for long runs."
+    )
+    parser.add_argument(
+        "--tensorrt", action="store_true",
+        help="Run the model as a TensorRT fp16 engine (CUDA + torch_tensorrt only). The engine "
+             "is built once per GPU/batch size and cached in trt_engines/; falls back to "
+             "PyTorch if torch_tensorrt is unavailable."
+    )
+    parser.add_argument(
+        "--coverage-concurrency", type=_positive_int, default=COVERAGE_API_CONCURRENCY,
         help="Concurrent workers scanning coverage tiles (default: %(default)s)."
     )
     parser.add_argument(
@@ -427,12 +630,16 @@ def main():
 
     PROCESSING_CONCURRENCY = args.processing_concurrency
     COVERAGE_API_CONCURRENCY = args.coverage_concurrency
+    DETECTION_BATCH_SIZE = args.batch_size
 
     # Initialize detectors (skipped for a scan: importing torch + loading the model takes a while):
     if not args.scan_only:
         from detectors.curb_ramp import CurbRampDetector
         global curb_ramp_detector
-        curb_ramp_detector = CurbRampDetector()
+        curb_ramp_detector = CurbRampDetector(half_precision=not args.full_precision,
+                                              compile=args.compile,
+                                              tensorrt=args.tensorrt,
+                                              batch_size=DETECTION_BATCH_SIZE)
 
     try:
         run_labeler(args.geojson_file, args.name or Path(args.geojson_file).stem, args.scan_only)
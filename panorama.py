@@ -1,3 +1,4 @@
+import numpy as np
 from PIL import Image
 from streetlevel import streetview
 
@@ -13,7 +14,9 @@ def fetch_panorama(metadata):
     metadata object. streetlevel stitches the tile grid and crops to the pano's true
     dimensions (both known from the metadata, so no probing is needed).
 
-    Returns a 4096x2048 RGB PIL image, or None on any failure (caller treats as a skip).
+    Returns the panorama as a 2048x4096x3 RGB uint8 array, or None on any failure
+    (caller treats as a skip). The conversion happens here, in the download thread, so
+    the thread feeding the GPU only has to copy the array into its batch.
     """
     try:
         # Older/third-party panos may not have zoom 3; use the highest available below it.
@@ -28,8 +31,10 @@ def fetch_panorama(metadata):
         if width > max_width:
             pano = pano.crop((0, 0, max_width, height))
         if pano.size != TARGET_SIZE:
-            pano = pano.resize(TARGET_SIZE, Image.BILINEAR)
-        return pano
+            # reducing_gap box-reduces by an integer factor first when shrinking a much
+            # larger pano (the INTER_AREA-style fast path); no effect when enlarging.
+            pano = pano.resize(TARGET_SIZE, Image.BILINEAR, reducing_gap=2.0)
+        return np.asarray(pano)
     except Exception as e:
         print(f"Error fetching panorama {metadata.id}: {e}")
         return None
@@ -9,23 +9,48 @@ and sends the records via POST requests to a Project Sidewalk ingest endpoint.
 Usage:
     python send_to_ps.py bend.jsonl --endpoint http://localhost:9000/ai/submitLabelsOnPano
 
-Submission progress is tracked in a sidecar file (<file>.submitted) so a re-run resumes
-where it left off instead of re-POSTing every line.
+Records are POSTed concurrently (--concurrency requests in flight). Submission progress is
+tracked in a sidecar file (<file>.submitted) so a re-run resumes where it left off instead of
+re-POSTing every line.
 """
 
 import argparse
-import json
+import asyncio
+import gzip
+import mmap
+import multiprocessing
 import os
-import time
+from concurrent.futures import ProcessPoolExecutor
 from contextlib import nullcontext
-from typing import Dict, Any, Optional, Set
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Set, Tuple
 from pathlib import Path
 
-import requests
+import aiohttp
+import numpy as np
+import orjson
 
 DEFAULT_ENDPOINT_URL = "http://localhost:9000/ai/submitLabelsOnPano"
+# Bulk endpoint for --batch-size > 1. Project Sidewalk doesn't have it yet: it must accept
+# {"labels_batch": [<submitLabelsOnPano payload>, ...]} and succeed or fail as a whole.
+DEFAULT_BATCH_ENDPOINT_URL = "http://localhost:9000/ai/submitLabelBatch"
+DEFAULT_CONCURRENCY = 16
 MAX_ATTEMPTS = 3
 RETRY_BACKOFF_SECONDS = [2, 8]
+REQUEST_TIMEOUT = aiohttp.ClientTimeout(total=30)
+# Sent records between progress lines.
+PROGRESS_EVERY = 1000
+READ_CHUNK_BYTES = 1 << 20
+# With --gzip, bodies at least this large are compressed (level 1: nearly the ratio of the
+# default level on JSON, at a fraction of the CPU).
+GZIP_MIN_BYTES = 1024
+# Bytes of an error response body printed with --verbose.
+ERROR_BODY_PREVIEW_BYTES = 1024
+# Success bodies up to this size are read (not decoded) so the connection can be reused.
+DRAIN_MAX_BYTES = 64 * 1024
+# From this many detections on, pixel coordinates are computed with NumPy instead of per
+# detection in Python. Building the label dicts dominates either way, so NumPy only pulls
+# ahead on large panos (measured break-even is ~48 detections).
+VECTORIZE_MIN_DETECTIONS = 64
 
 
 def transform_record(data: Dict[str, Any]) -> Dict[str, Any]:
@@ -33,77 +58,161 @@ def transform_record(data: Dict[str, Any]) -> Dict[str, Any]:
     Convert a main.py JSONL record into the payload expected by Project Sidewalk.
 
     Detections are converted from normalized coordinates to pixel coordinates using the
-    pano dimensions stored in the record, renamed 'detections' -> 'labels'.
+    pano dimensions stored in the record, renamed 'detections' -> 'labels'. The record is
+    converted in place and returned (callers pass a freshly parsed line); copy it first if
+    you need the original.
     """
-    modified_data = data.copy()
-    modified_data['labels'] = [
+    detections = data.pop('detections')
+    width, height = data['pano']['width'], data['pano']['height']
+    if len(detections) >= VECTORIZE_MIN_DETECTIONS:
+        data['labels'] = _pixel_labels_vectorized(detections, width, height)
+        return data
+
+    data['labels'] = [
         {
-            "pano_x": round(detection['x_normalized'] * modified_data['pano']['width']),
-            "pano_y": round(detection['y_normalized'] * modified_data['pano']['height']),
+            "pano_x": round(detection['x_normalized'] * width),
+            "pano_y": round(detection['y_normalized'] * height),
             "confidence": detection['confidence']
-        } for detection in data['detections']
+        } for detection in detections
+    ]
+    return data
+
+
+def _pixel_labels_vectorized(detections, width, height):
+    """
+    transform_record's label conversion as one NumPy pass. float64 products and np.rint
+    (round half to even, like round) give exactly the same pixels as the scalar path.
+    """
+    count = len(detections)
+    xs = np.fromiter((d['x_normalized'] for d in detections), dtype=np.float64, count=count)
+    ys = np.fromiter((d['y_normalized'] for d in detections), dtype=np.float64, count=count)
+    pano_xs = np.rint(xs * width).astype(np.int64).tolist()
+    pano_ys = np.rint(ys * height).astype(np.int64).tolist()
+    return [
+        {"pano_x": pano_x, "pano_y": pano_y, "confidence": detection['confidence']}
+        for pano_x, pano_y, detection in zip(pano_xs, pano_ys, detections)
     ]
-    modified_data.pop('detections', None)
-    return modified_data
 
 
-def send_to_project_sidewalk(
-    payload: Dict[str, Any], endpoint_url: str, api_key: Optional[str] = None
-) -> Optional[requests.Response]:
+def session_headers(api_key: Optional[str] = None) -> Dict[str, str]:
+    """
+    Default headers for every request on the submission session. When an API key is given, it
+    is sent as an ``Authorization: Bearer`` header so requests can authenticate to the ingest
+    endpoint.
+    """
+    headers = {
+        'Content-Type': 'application/json',
+        'Accept': 'application/json'
+    }
+    if api_key:
+        headers['Authorization'] = f'Bearer {api_key}'
+    return headers
+
+
+async def send_to_project_sidewalk(
+    session: aiohttp.ClientSession,
+    payload: Dict[str, Any],
+    endpoint_url: str,
+    verbose: bool = False,
+    compress: bool = False,
+) -> Optional[aiohttp.ClientResponse]:
     """
     Send a POST request with JSON data to the specified PS endpoint, retrying on
     transient failures.
 
     Args:
+        session: The client session to send the request on; it carries the headers (see
+            ``session_headers``) and pooled keep-alive connections.
         payload: The transformed JSON data to send in the POST request.
         endpoint_url: The target endpoint URL.
-        api_key: Optional Project Sidewalk internal API key. When provided, it is sent as an
-            ``Authorization: Bearer`` header so the request can authenticate to the ingest endpoint.
+        verbose: If True, print error statuses, response bodies and each retry.
+        compress: If True, gzip bodies of GZIP_MIN_BYTES or more (sent with
+            ``Content-Encoding: gzip``; the server must decode it).
 
     Returns:
-        The response object if successful, None if an error occurred. Retries up to
+        The response object if successful (any 2xx), None if an error occurred. Retries up to
         MAX_ATTEMPTS times with backoff on connection errors and 5xx responses; 4xx
         responses are treated as permanent and not retried.
     """
-    headers = {
-        'Content-Type': 'application/json',
-        'Accept': 'application/json'
-    }
-    if api_key:
-        headers['Authorization'] = f'Bearer {api_key}'
-
+    # Serialized (and compressed) once, up front, so retries resend the same bytes.
+    body = orjson.dumps(payload)
+    headers = None
+    if compress and len(body) >= GZIP_MIN_BYTES:
+        body = gzip.compress(body, compresslevel=1)
+        headers = {'Content-Encoding': 'gzip'}
     for attempt in range(1, MAX_ATTEMPTS + 1):
         try:
-            response = requests.post(
+            async with session.post(
                 endpoint_url,
-                json=payload,
+                data=body,
                 headers=headers,
-                timeout=30
-            )
+                timeout=REQUEST_TIMEOUT
+            ) as response:
+                if 200 <= response.status < 300:
+                    await _drain(response)
+                    return response
+
+                # Print the start of the error response body for diagnosis (it may be a
+                # large HTML error page).
+                if verbose:
+                    preview = await response.content.read(ERROR_BODY_PREVIEW_BYTES)
+                    print(f"HTTP {response.status}: {preview.decode('utf-8', errors='replace')}")
+
+                # 4xx means the payload or auth is wrong; retrying won't help.
+                if 400 <= response.status < 500:
+                    if verbose:
+                        print(f"Permanent error (HTTP {response.status}); not retrying.")
+                    return None
+
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            if verbose:
+                print(f"Error sending POST request (attempt {attempt}/{MAX_ATTEMPTS}): {e!r}")
 
-            if response.status_code == 200:
-                return response
+        if attempt < MAX_ATTEMPTS:
+            backoff = RETRY_BACKOFF_SECONDS[attempt - 1]
+            if verbose:
+                print(f"Retrying in {backoff}s...")
+            # The request keeps its concurrency slot while it waits, so a struggling
+            # server also sees fewer new requests.
+            await asyncio.sleep(backoff)
 
-            # Print the error response body for diagnosis.
-            try:
-                print(json.dumps(response.json(), indent=2))
-            except json.JSONDecodeError:
-                print(response.text)
+    return None
 
-            # 4xx means the payload or auth is wrong; retrying won't help.
-            if 400 <= response.status_code < 500:
-                print(f"Permanent error (HTTP {response.status_code}); not retrying.")
-                return None
 
-        except requests.exceptions.RequestException as e:
-            print(f"Error sending POST request (attempt {attempt}/{MAX_ATTEMPTS}): {e}")
+async def _drain(response: aiohttp.ClientResponse) -> None:
+    """
+    Reads and discards a response body of up to DRAIN_MAX_BYTES. aiohttp only returns a
+    connection to the keep-alive pool once its body has been consumed; past that size,
+    reopening a connection is cheaper than reading the rest.
+    """
+    if response.content_length is not None and response.content_length > DRAIN_MAX_BYTES:
+        return
+    drained = 0
+    while drained <= DRAIN_MAX_BYTES and (chunk := await response.content.readany()):
+        drained += len(chunk)
 
-        if attempt < MAX_ATTEMPTS:
-            backoff = RETRY_BACKOFF_SECONDS[attempt - 1]
-            print(f"Retrying in {backoff}s...")
-            time.sleep(backoff)
 
-    return None
+def _iter_lines(file, limit: Optional[int] = None) -> Iterator[bytes]:
+    """
+    Yields the lines of a binary file without their trailing newline, reading READ_CHUNK_BYTES
+    at a time, up to `limit` bytes if given. Numbered from 1, they match iterating the file in
+    text mode, which the sidecar's line numbers rely on.
+    """
+    remaining = float('inf') if limit is None else limit
+    partial = []  # pieces of a line that spans chunks
+    while remaining > 0 and (chunk := file.read(min(READ_CHUNK_BYTES, remaining))):
+        remaining -= len(chunk)
+        lines = chunk.split(b'\n')
+        if len(lines) == 1:
+            partial.append(chunk)
+            continue
+        partial.append(lines[0])
+        lines[0] = b''.join(partial)
+        partial = [lines.pop()]
+        yield from lines
+    tail = b''.join(partial)
+    if tail:
+        yield tail
 
 
 def load_submitted_lines(sidecar_path: Path) -> Set[int]:
@@ -114,39 +223,203 @@ def load_submitted_lines(sidecar_path: Path) -> Set[int]:
         return {int(line) for line in f if line.strip()}
 
 
-def process_jsonl_file(
+async def _submit_lines(
+    lines: Iterable[bytes],
+    first_line_number: int,
+    submitted_lines: Set[int],
+    f_sidecar,
+    *,
+    endpoint_url: str,
+    api_key: Optional[str],
+    dry_run: bool,
+    concurrency: int,
+    verbose: bool,
+    batch_size: int,
+    compress: bool,
+) -> Tuple[int, int, int]:
+    """
+    Transforms and submits JSONL lines, numbered from first_line_number, appending each
+    submitted line number to f_sidecar (None for a dry run). The keyword arguments are
+    process_jsonl_file's. Returns (success_count, error_count, skipped_count).
+    """
+    success_count = 0
+    error_count = 0
+    skipped_count = 0
+
+    semaphore = asyncio.Semaphore(concurrency)
+    sent_count = 0
+
+    async def submit(line_numbers: List[int], payload: Dict[str, Any]) -> None:
+        """Sends the payload for these lines; the caller has already taken its semaphore slot."""
+        nonlocal success_count, error_count, sent_count
+        if len(line_numbers) == 1:
+            where = f"Line {line_numbers[0]}"
+        else:
+            where = f"Lines {line_numbers[0]}-{line_numbers[-1]} ({len(line_numbers)} records)"
+        try:
+            response = await send_to_project_sidewalk(session, payload, endpoint_url, verbose, compress)
+            if response is not None:
+                success_count += len(line_numbers)
+                # Completion order, not file order; load_submitted_lines doesn't care.
+                f_sidecar.write(''.join(f"{n}\n" for n in line_numbers))
+                f_sidecar.flush()
+            else:
+                error_count += len(line_numbers)
+                print(f"{where}: Failed to send POST request")
+        except Exception as e:
+            error_count += len(line_numbers)
+            print(f"{where}: Unexpected error - {e}")
+        finally:
+            semaphore.release()
+
+        previous_count = sent_count
+        sent_count += len(line_numbers)
+        if sent_count // PROGRESS_EVERY > previous_count // PROGRESS_EVERY:
+            print(f"{sent_count} records sent ({success_count} succeeded, {error_count} errors)...")
+
+    async def dispatch(line_numbers: List[int], payload: Dict[str, Any]) -> None:
+        # Send POST requests concurrently in a rolling window: reading waits only until any
+        # in-flight request finishes, never for a whole batch.
+        await semaphore.acquire()
+        task = asyncio.create_task(submit(line_numbers, payload))
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
+
+    in_flight = set()
+    batch_lines, batch = [], []
+    # One session for all the lines: every request reuses its pooled connections and headers.
+    connector = aiohttp.TCPConnector(limit=concurrency, keepalive_timeout=75)
+    async with aiohttp.ClientSession(connector=connector, headers=session_headers(api_key)) as session:
+        for line_number, line in enumerate(lines, first_line_number):
+            line = line.strip()
+
+            # Skip empty lines and lines submitted on a previous run.
+            if not line:
+                continue
+            if line_number in submitted_lines:
+                skipped_count += 1
+                continue
+
+            try:
+                # Parse a line of JSON and convert to the PS payload format.
+                json_data = orjson.loads(line)
+                payload = transform_record(json_data)
+            except orjson.JSONDecodeError as e:
+                error_count += 1
+                print(f"Line {line_number}: Invalid JSON - {e}")
+                continue
+            except Exception as e:
+                error_count += 1
+                print(f"Line {line_number}: Unexpected error - {e}")
+                continue
+
+            if dry_run:
+                print(orjson.dumps(payload, option=orjson.OPT_INDENT_2).decode())
+                success_count += 1
+                continue
+
+            if batch_size == 1:
+                await dispatch([line_number], payload)
+                continue
+            batch_lines.append(line_number)
+            batch.append(payload)
+            if len(batch) == batch_size:
+                await dispatch(batch_lines, {"labels_batch": batch})
+                batch_lines, batch = [], []
+
+        if batch:
+            await dispatch(batch_lines, {"labels_batch": batch})
+        await asyncio.gather(*in_flight)
+
+    return success_count, error_count, skipped_count
+
+
+def _submit_shard(
+    file_path: str, start: int, end: int, first_line_number: int, options: Dict[str, Any]
+) -> Tuple[int, int, int]:
+    """
+    Worker-process entry point for process_jsonl_file(processes > 1): submits the lines in
+    bytes [start, end) of the file on the worker's own event loop and session. All workers
+    append to the same sidecar; each entry is one small O_APPEND write, so they don't
+    interleave.
+    """
+    sidecar_path = Path(f"{file_path}.submitted")
+    submitted_lines = load_submitted_lines(sidecar_path)
+    with open(file_path, 'rb', buffering=0) as file, open(sidecar_path, 'a', encoding='utf-8') as f_sidecar:
+        file.seek(start)
+        return asyncio.run(_submit_lines(
+            _iter_lines(file, end - start), first_line_number, submitted_lines, f_sidecar, **options))
+
+
+def _shard_ranges(file, shards: int) -> List[Tuple[int, int, int]]:
+    """
+    Splits a binary file into at most `shards` byte ranges of about equal size that start
+    and end on line boundaries. Returns (start, end, first_line_number) per range.
+    """
+    size = os.fstat(file.fileno()).st_size
+    if size == 0:
+        return [(0, 0, 1)]
+    with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        starts = [0]
+        for k in range(1, shards):
+            newline = mm.find(b'\n', max(k * size // shards, starts[-1]))
+            if newline == -1 or newline + 1 >= size:
+                break
+            starts.append(newline + 1)
+
+        ranges = []
+        line_number = 1
+        for start, end in zip(starts, starts[1:] + [size]):
+            ranges.append((start, end, line_number))
+            for pos in range(start, end, READ_CHUNK_BYTES):
+                line_number += mm[pos:min(pos + READ_CHUNK_BYTES, end)].count(b'\n')
+    return ranges
+
+
+async def process_jsonl_file(
     file_path: str,
     endpoint_url: str = DEFAULT_ENDPOINT_URL,
     api_key: Optional[str] = None,
     dry_run: bool = False,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    verbose: bool = False,
+    batch_size: int = 1,
+    compress: bool = False,
+    processes: int = 1,
 ) -> None:
     """
     Process a JSONL file containing detections from main.py by reading each line and sending
-    POST requests to PS.
+    POST requests to PS, up to `concurrency` at a time.
 
     Args:
         file_path: Path to the JSONL file to process.
         endpoint_url: The endpoint URL to send POST requests to.
-        api_key: Optional Project Sidewalk internal API key, forwarded to each request (see
-            ``send_to_project_sidewalk``).
+        api_key: Optional Project Sidewalk internal API key, sent with every request (see
+            ``session_headers``).
         dry_run: If True, print the transformed payloads instead of POSTing them, and do not
             record submission progress.
+        concurrency: Maximum number of POST requests in flight at once.
+        verbose: If True, print error response bodies and retries, not just the failed line.
+        batch_size: Records per POST. 1 sends each record on its own (submitLabelsOnPano);
+            more sends {"labels_batch": [...]} bodies, which need a bulk endpoint (see
+            DEFAULT_BATCH_ENDPOINT_URL).
+        compress: If True, gzip large request bodies (see ``send_to_project_sidewalk``).
+        processes: Worker processes to split the file across, each with its own event loop
+            and `concurrency` requests in flight (ignored for a dry run).
     """
-    input_file = Path(file_path)
-
-    # Validate file exists.
-    if not input_file.exists():
+    try:
+        file = open(file_path, 'rb', buffering=0)
+    except FileNotFoundError:
         print(f"Error: File '{file_path}' does not exist.")
         return
+    except IOError as e:
+        print(f"Error reading file: {e}")
+        return
 
-    # Load resume state: line numbers that already got a 200 on a previous run.
+    # Load resume state: line numbers that already got a 2xx on a previous run.
     sidecar_path = Path(f"{file_path}.submitted")
     submitted_lines = load_submitted_lines(sidecar_path)
 
-    success_count = 0
-    error_count = 0
-    skipped_count = 0
-
     print(f"Processing JSONL file: {file_path}")
     print(f"Target endpoint: {endpoint_url}")
     if dry_run:
@@ -155,53 +428,30 @@ def process_jsonl_file(
         print(f"Resuming: {len(submitted_lines)} lines already submitted (per {sidecar_path.name}).")
     print("-" * 50)
 
+    options = dict(
+        endpoint_url=endpoint_url, api_key=api_key, dry_run=dry_run, concurrency=concurrency,
+        verbose=verbose, batch_size=batch_size, compress=compress)
     try:
-        # A dry run records nothing, so don't create (or touch) the sidecar file.
-        with open(input_file, 'r', encoding='utf-8') as file, \
-             (nullcontext() if dry_run else open(sidecar_path, 'a', encoding='utf-8')) as f_sidecar:
-            for line_number, line in enumerate(file, 1):
-                line = line.strip()
-
-                # Skip empty lines and lines submitted on a previous run.
-                if not line:
-                    continue
-                if line_number in submitted_lines:
-                    skipped_count += 1
-                    continue
-
-                try:
-                    # Parse a line of JSON and convert to the PS payload format.
-                    json_data = json.loads(line)
-                    payload = transform_record(json_data)
-
-                    if dry_run:
-                        print(json.dumps(payload, indent=2))
-                        success_count += 1
-                        continue
-
-                    # Send POST request.
-                    response = send_to_project_sidewalk(payload, endpoint_url, api_key)
-
-                    if response:
-                        success_count += 1
-                        f_sidecar.write(f"{line_number}\n")
-                        f_sidecar.flush()
-                    else:
-                        error_count += 1
-                        print(f"Line {line_number}: Failed to send POST request")
-
-                except json.JSONDecodeError as e:
-                    error_count += 1
-                    print(f"Line {line_number}: Invalid JSON - {e}")
-
-                except Exception as e:
-                    error_count += 1
-                    print(f"Line {line_number}: Unexpected error - {e}")
+        with file:
+            if processes > 1 and not dry_run:
+                # Parsing and transforming are CPU-bound, so large files can be split across
+                # processes: each shard gets its own event loop, session and line numbering.
+                shards = _shard_ranges(file, processes)
+                loop = asyncio.get_running_loop()
+                with ProcessPoolExecutor(len(shards), mp_context=multiprocessing.get_context('spawn')) as pool:
+                    counts = await asyncio.gather(*(
+                        loop.run_in_executor(pool, _submit_shard, file_path, *shard, options) for shard in shards))
+            else:
+                # A dry run records nothing, so don't create (or touch) the sidecar file.
+                with (nullcontext() if dry_run else open(sidecar_path, 'a', encoding='utf-8')) as f_sidecar:
+                    counts = [await _submit_lines(_iter_lines(file), 1, submitted_lines, f_sidecar, **options)]
 
     except IOError as e:
         print(f"Error reading file: {e}")
         return
 
+    success_count, error_count, skipped_count = (sum(column) for column in zip(*counts))
+
     # Print summary.
     print("-" * 50)
     print(f"Processing complete!")
@@ -210,6 +460,17 @@ def process_jsonl_file(
     print(f"Errors encountered:            {error_count} records")
 
 
+def _positive_int(value: str) -> int:
+    """argparse type for counts that must be at least 1."""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid int value: {value!r}")
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(
         description="Submit a main.py JSONL file of AI label predictions to a Project Sidewalk endpoint."
@@ -220,8 +481,8 @@ def main() -> None:
     )
     parser.add_argument(
         "--endpoint",
-        default=DEFAULT_ENDPOINT_URL,
-        help=f"Project Sidewalk ingest endpoint URL (default: {DEFAULT_ENDPOINT_URL})."
+        help=f"Project Sidewalk ingest endpoint URL (default: {DEFAULT_ENDPOINT_URL}, or "
+             f"{DEFAULT_BATCH_ENDPOINT_URL} with --batch-size above 1)."
     )
     parser.add_argument(
         "--api-key-env",
@@ -235,10 +496,47 @@ def main() -> None:
         action="store_true",
         help="Print transformed payloads instead of POSTing them; no progress is recorded."
     )
+    parser.add_argument(
+        "--concurrency",
+        type=_positive_int,
+        default=DEFAULT_CONCURRENCY,
+        help=f"Maximum POST requests in flight at once (default: {DEFAULT_CONCURRENCY}). "
+             "Lower this if the server starts timing out."
+    )
+    parser.add_argument(
+        "--verbose",
+        action="store_true",
+        help="Print error statuses, response bodies and retries, not just one line per failed record."
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=_positive_int,
+        default=1,
+        help="Records per POST (default: 1, one per pano). Larger batches are sent as "
+             "{\"labels_batch\": [...]} to a bulk endpoint, which the Project Sidewalk server "
+             "must provide; a rejected batch fails all of its records."
+    )
+    parser.add_argument(
+        "--gzip",
+        action="store_true",
+        help=f"Gzip request bodies of {GZIP_MIN_BYTES} bytes or more (Content-Encoding: gzip). "
+             "Only use this if the server decodes compressed request bodies."
+    )
+    parser.add_argument(
+        "--processes",
+        type=_positive_int,
+        default=1,
+        help="Split the file across this many worker processes, each with --concurrency requests "
+             "in flight (default: 1). Helps when parsing, not the server, is the bottleneck; "
+             "progress lines are then per process."
+    )
     args = parser.parse_args()
 
     api_key = os.environ.get(args.api_key_env)
-    process_jsonl_file(args.jsonl_file, args.endpoint, api_key, args.dry_run)
+    endpoint = args.endpoint or (DEFAULT_BATCH_ENDPOINT_URL if args.batch_size > 1 else DEFAULT_ENDPOINT_URL)
+    asyncio.run(process_jsonl_file(
+        args.jsonl_file, endpoint, api_key, args.dry_run, args.concurrency, args.verbose, args.batch_size,
+        args.gzip, args.processes))
 
 
 if __name__ == "__main__":
@@ -51,7 +51,7 @@ def make_metadata(**overrides):
 
 
 def make_process_result(**overrides):
-    """A main.process_pano success result, ready for main.build_output_line."""
+    """A main.detect_downloaded success result, ready for main.build_output_line."""
     base = dict(pano_id="PID", lat=44.05, lon=-121.31, metadata=make_metadata(),
                 detections=[(0.5, 0.25, 0.9)])
     base.update(overrides)
@@ -1,7 +1,9 @@
 """Unit tests for main.py's pure helpers (no network, no model)."""
-import json
+from types import SimpleNamespace
 
+import orjson
 import pytest
+from shapely.geometry import shape
 
 import main
 from conftest import make_metadata as _metadata, make_process_result as _result
@@ -23,6 +25,17 @@ def test_latlon_to_tile_monotonic():
     assert x_e > x_w and y_s > y_n
 
 
+def test_tile_to_bbox_inverts_latlon_to_tile():
+    # Zoom 0 is the whole Web Mercator world.
+    min_lon, min_lat, max_lon, max_lat = main.tile_to_bbox(0, 0, 0)
+    assert (min_lon, max_lon) == (-180.0, 180.0)
+    assert max_lat == pytest.approx(85.0511, abs=1e-4) and min_lat == pytest.approx(-85.0511, abs=1e-4)
+    # The Bend tile's bounds contain the point that produced it.
+    min_lon, min_lat, max_lon, max_lat = main.tile_to_bbox(21366, 47630, 17)
+    assert min_lon <= -121.315 < max_lon and min_lat < 44.058 <= max_lat
+    assert main.latlon_to_tile((min_lat + max_lat) / 2, (min_lon + max_lon) / 2, 17) == (21366, 47630)
+
+
 def test_geojson_hash_stable_across_key_order():
     a = {"type": "Polygon", "coordinates": [[[0, 0], [1, 0], [1, 1], [0, 0]]]}
     b = {"coordinates": [[[0, 0], [1, 0], [1, 1], [0, 0]]], "type": "Polygon"}
@@ -35,10 +48,22 @@ def test_geojson_hash_stable_across_key_order():
 def test_load_processed_ids(tmp_path):
     assert main.load_processed_ids(tmp_path / "missing.txt") == set()
     cache = tmp_path / "cache.txt"
-    cache.write_text("abc\ndef\nabc\n")
+    cache.write_text("abc\ndef\nabc\n\n")
     assert main.load_processed_ids(cache) == {"abc", "def"}
 
 
+def test_fetch_panos_for_tile_keeps_only_panos_inside_area(monkeypatch):
+    area = shape({"type": "Polygon", "coordinates": [[[0, 0], [2, 0], [2, 2], [0, 2], [0, 0]]]})
+    panos = [SimpleNamespace(id="IN", lat=1.0, lon=1.0),
+             SimpleNamespace(id="OUT", lat=1.0, lon=3.0),
+             SimpleNamespace(id="EDGE", lat=0.0, lon=1.0)]  # on the boundary: not within
+    monkeypatch.setattr(main.streetview, "get_coverage_tile", lambda x, y, session=None: panos)
+    assert main.fetch_panos_for_tile(0, 0, area) == {"IN": (1.0, 1.0)}
+
+    monkeypatch.setattr(main.streetview, "get_coverage_tile", lambda x, y, session=None: [])
+    assert main.fetch_panos_for_tile(0, 0, area) == {}
+
+
 def test_build_output_line_shape_and_units():
     line = main.build_output_line(_result())
     assert line["detections"] == [
@@ -55,7 +80,7 @@ def test_build_output_line_shape_and_units():
     # Historical pano without a date is dropped.
     assert pano["history"] == [{"pano_id": "OLD1", "date": "2019-08"}]
     assert pano["links"] == []
-    json.dumps(line)  # must be JSON-serializable as written
+    orjson.dumps(line)  # must be serializable by the writer main.py uses
 
 
 def test_build_output_line_zero_detections():
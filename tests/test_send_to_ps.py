@@ -39,10 +39,21 @@ def test_transform_record_zero_detections():
     assert payload["labels"] == [] and "detections" not in payload
 
 
-def test_transform_record_does_not_mutate_input():
+def test_transform_record_vectorized_path_matches_scalar_rounding():
+    # Exact .5 pixel products included: both paths must round half to even.
+    xs = [(k + 0.5) / 16384 for k in range(40)] + [k / 997 for k in range(40)]
+    detections = [{"x_normalized": x, "y_normalized": x, "confidence": 0.6} for x in xs]
+    assert len(detections) >= send_to_ps.VECTORIZE_MIN_DETECTIONS
+    payload = send_to_ps.transform_record(_record(detections))
+    assert payload["labels"] == [
+        {"pano_x": round(x * 16384), "pano_y": round(x * 8192), "confidence": 0.6} for x in xs]
+    assert all(type(label["pano_x"]) is int for label in payload["labels"])
+
+
+def test_transform_record_converts_in_place():
     record = _record([{"x_normalized": 0.5, "y_normalized": 0.5, "confidence": 0.7}])
-    send_to_ps.transform_record(record)
-    assert "detections" in record and "labels" not in record
+    assert send_to_ps.transform_record(record) is record
+    assert "detections" not in record and len(record["labels"]) == 1
 
 
 def test_transform_accepts_real_stage1_records():
@@ -63,3 +74,30 @@ def test_load_submitted_lines(tmp_path):
     sidecar = tmp_path / "r.jsonl.submitted"
     sidecar.write_text("1\n3\n\n3\n")
     assert send_to_ps.load_submitted_lines(sidecar) == {1, 3}
+
+
+def test_iter_lines_numbers_match_text_mode(tmp_path, monkeypatch):
+    # Tiny chunks so lines straddle chunk boundaries; includes a blank line and no final newline.
+    monkeypatch.setattr(send_to_ps, "READ_CHUNK_BYTES", 4)
+    path = tmp_path / "r.jsonl"
+    path.write_bytes(b'{"a": 1}\n\n{"long": "' + b"x" * 25 + b'"}\r\n{"b": 2}')
+    with open(path, "rb") as f:
+        chunked = [line.strip() for line in send_to_ps._iter_lines(f)]
+    with open(path, encoding="utf-8") as f:
+        text_mode = [line.strip().encode() for line in f]
+    assert chunked == text_mode and len(chunked) == 4
+
+
+def test_shard_ranges_split_on_lines_and_keep_numbering(tmp_path, monkeypatch):
+    monkeypatch.setattr(send_to_ps, "READ_CHUNK_BYTES", 8)
+    path = tmp_path / "r.jsonl"
+    path.write_bytes(b"".join(b'{"n": %d}\n' % i + (b"\n" if i % 3 == 0 else b"") for i in range(1, 30)))
+    with open(path, "rb") as f:
+        expected = list(enumerate(send_to_ps._iter_lines(f), 1))
+        ranges = send_to_ps._shard_ranges(f, 4)
+        assert len(ranges) == 4
+        sharded = []
+        for start, end, first_line_number in ranges:
+            f.seek(start)
+            sharded += enumerate(send_to_ps._iter_lines(f, end - start), first_line_number)
+    assert sharded == expected